@@ -11,10 +11,21 @@ USE CASE: Safe, automated deployments with health checks and rollback capabiliti
 
 import os
 import sys
+import asyncio
+import socket
+import glob
 import time
+import math
+import signal
+import shutil
 import subprocess
+import tempfile
 import json
+from dataclasses import dataclass, field
+from typing import Callable, Optional
+import http.client
 from datetime import datetime
+from urllib.parse import urlparse
 
 # -----------------------------------------------------------------------------
 # STEP 1: Configuration - Customize these values
@@ -26,12 +37,20 @@ APP_VERSION = "v2.5.0"
 
 # Deployment paths
 SOURCE_DIR = "/tmp/builds/web-application"  # Where the build artifacts are
-DEPLOY_DIR = "/opt/applications/web-application"  # Where to deploy
+DEPLOY_DIR = "/opt/applications/web-application"  # Symlink to the live release
+RELEASES_DIR = "/opt/applications/releases/web-application"  # One directory per release
 BACKUP_DIR = "/opt/backups/web-application"  # Where to backup old version
+KEEP_RELEASES = 5  # Old releases (and backups) to keep for rollback
+START_LOG_FILE = "/var/log/web-application/start.log"  # Output of the start command (and the app)
 
 # Health check endpoint
 HEALTH_CHECK_URL = "http://localhost:8080/health"
 HEALTH_CHECK_TIMEOUT = 60  # seconds to wait for app to be healthy
+HEALTH_CHECK_POLL_BUDGET = 12  # max number of health check attempts
+HEALTH_CHECK_EXPECTED_STARTUP = 10  # typical seconds for app to become healthy
+
+# Shutdown settings
+STOP_TIMEOUT = 10  # seconds to wait for graceful shutdown before SIGKILL
 
 # Notification settings
 SLACK_WEBHOOK = "https://hooks.slack.com/services/YOUR/WEBHOOK/URL"
@@ -47,37 +66,140 @@ class Colors:
     CYAN = '\033[96m'
     END = '\033[0m'  # Reset to default color
 
+# No color codes when output goes to a file or CI log
+if not sys.stdout.isatty():
+    for color in ("RED", "GREEN", "YELLOW", "BLUE", "CYAN", "END"):
+        setattr(Colors, color, "")
+
 # -----------------------------------------------------------------------------
 # STEP 2: Helper function to print colored messages
 # -----------------------------------------------------------------------------
 
+# Prefixes are built once instead of on every message
+_INFO_PREFIX = f"{Colors.BLUE}[INFO]{Colors.END} "
+_SUCCESS_PREFIX = f"{Colors.GREEN}[SUCCESS]{Colors.END} "
+_WARNING_PREFIX = f"{Colors.YELLOW}[WARNING]{Colors.END} "
+_ERROR_PREFIX = f"{Colors.RED}[ERROR]{Colors.END} "
+
 def print_info(message):
     """Print informational message in blue"""
-    print(f"{Colors.BLUE}[INFO]{Colors.END} {message}")
+    sys.stdout.write(_INFO_PREFIX + message + "\n")
 
 def print_success(message):
     """Print success message in green"""
-    print(f"{Colors.GREEN}[SUCCESS]{Colors.END} {message}")
+    sys.stdout.write(_SUCCESS_PREFIX + message + "\n")
 
 def print_warning(message):
     """Print warning message in yellow"""
-    print(f"{Colors.YELLOW}[WARNING]{Colors.END} {message}")
+    sys.stdout.write(_WARNING_PREFIX + message + "\n")
 
 def print_error(message):
     """Print error message in red"""
-    print(f"{Colors.RED}[ERROR]{Colors.END} {message}")
+    sys.stdout.write(_ERROR_PREFIX + message + "\n")
+
+def flush_output():
+    """
+    Write out buffered messages
+
+    Output is block-buffered (see main), so call this before anything
+    slow - waiting, or running a command that writes to the terminal.
+    """
+    sys.stdout.flush()
 
 # -----------------------------------------------------------------------------
-# STEP 3: Function to run shell commands
+# STEP 3: Function to run system commands
 # -----------------------------------------------------------------------------
 
-def run_command(command, description=""):
+# Only the last 64 KB of a command's error output is kept (for error messages)
+MAX_ERROR_OUTPUT = 64 * 1024
+
+def _read_tail(file, limit, start=0):
+    """
+    Read the last `limit` bytes of a file opened in binary mode
+
+    Args:
+        file: Open binary file
+        limit: Maximum number of bytes to read
+        start: Ignore anything before this offset
+
+    Returns:
+        The tail of the file as text
+    """
+    size = file.seek(0, os.SEEK_END)
+    file.seek(max(start, size - limit))
+    return file.read().decode(errors="replace")
+
+def open_log_file(path):
+    """
+    Open a log file for appending (and reading back), creating it if needed
+
+    A symlink at the log path is refused rather than followed, so nobody
+    can point it at another file for us to write to.
+
+    Args:
+        path: Log file path
+
+    Returns:
+        File object opened in binary append mode
+    """
+    os.makedirs(os.path.dirname(path), mode=0o750, exist_ok=True)
+    fd = os.open(path, os.O_RDWR | os.O_APPEND | os.O_CREAT | os.O_NOFOLLOW, 0o640)
+    return os.fdopen(fd, "a+b")
+
+# Every command gets its own process. Small filesystem steps (mkdir,
+# chmod, rm, ln) don't go through here at all - see run_file_operation.
+def _run_process(command, output, log_file=None):
+    """
+    Run a command in its own process
+
+    stderr goes to a file rather than a pipe: background processes the
+    command starts inherit it, and a pipe would break (SIGPIPE) once
+    this script exits.
+
+    Args:
+        command: The command to run (as list of arguments)
+        output: Show the command's stdout on the terminal
+        log_file: Append stdout and stderr to this file instead
+
+    Returns:
+        (exit code, last part of stderr)
+    """
+    if log_file:
+        error_file = open_log_file(log_file)
+        stdout = error_file
+    else:
+        error_file = tempfile.TemporaryFile()
+        stdout = None if output else subprocess.DEVNULL  # None = straight to terminal
+
+    with error_file:
+        # Only this run's output goes into the error message
+        start = error_file.seek(0, os.SEEK_END)
+        process = subprocess.Popen(command, stdout=stdout, stderr=error_file)
+
+        try:
+            returncode = process.wait(timeout=300)  # Timeout after 5 minutes
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
+            raise
+
+        return returncode, _read_tail(error_file, MAX_ERROR_OUTPUT, start)
+
+def run_command(command, description="", output=False, log_file=None):
     """
-    Run a shell command and return the result
+    Run a command and return the result
+
+    The command is executed directly (no /bin/sh in between), so it must
+    be given as a list of arguments, e.g. ["mkdir", "-p", path].
+    Output is never buffered in memory: stdout is discarded (or shown on
+    the terminal with output=True, or appended to log_file) and only the
+    tail of stderr is read back for error messages.
 
     Args:
-        command: The shell command to run (as string or list)
+        command: The command to run (as list of arguments)
         description: What this command does (for logging)
+        output: Show the command's stdout on the terminal
+        log_file: Append the command's stdout and stderr to this file
 
     Returns:
         True if command succeeded, False otherwise
@@ -85,24 +207,22 @@ def run_command(command, description=""):
     if description:
         print_info(description)
 
+    if isinstance(command, str):
+        print_error(f"Command must be a list of arguments, got string: {command}")
+        return False
+
+    flush_output()
     try:
-        # Run the command and capture output
-        result = subprocess.run(
-            command,
-            shell=True if isinstance(command, str) else False,
-            capture_output=True,  # Capture stdout and stderr
-            text=True,  # Return output as string (not bytes)
-            timeout=300  # Timeout after 5 minutes
-        )
+        returncode, stderr = _run_process(command, output, log_file)
 
         # Check if command was successful
-        if result.returncode == 0:
+        if returncode == 0:
             print_success(f"Command completed successfully")
             return True
         else:
-            print_error(f"Command failed with exit code {result.returncode}")
-            if result.stderr:
-                print_error(f"Error: {result.stderr}")
+            print_error(f"Command failed with exit code {returncode}")
+            if stderr:
+                print_error(f"Error: {stderr}")
             return False
 
     except subprocess.TimeoutExpired:
@@ -112,10 +232,136 @@ def run_command(command, description=""):
         print_error(f"Failed to run command: {str(e)}")
         return False
 
+def run_pipeline(commands, description=""):
+    """
+    Run commands connected by pipes (like "a | b | c") without a shell
+
+    Data streams from one command to the next, so nothing is written to
+    disk in between and all stages run at the same time.
+
+    Args:
+        commands: List of commands (each a list of arguments)
+        description: What this pipeline does (for logging)
+
+    Returns:
+        True if every command succeeded, False otherwise
+    """
+    if description:
+        print_info(description)
+
+    flush_output()
+    processes = []
+    error_files = []
+    try:
+        previous_stdout = None
+        for index, command in enumerate(commands):
+            is_last = index == len(commands) - 1
+            error_file = tempfile.TemporaryFile()
+            error_files.append(error_file)
+            process = subprocess.Popen(
+                command,
+                stdin=previous_stdout,
+                stdout=subprocess.DEVNULL if is_last else subprocess.PIPE,
+                stderr=error_file
+            )
+            # Only the next command reads this pipe now (so SIGPIPE works)
+            if previous_stdout is not None:
+                previous_stdout.close()
+            previous_stdout = process.stdout
+            processes.append(process)
+
+        deadline = time.monotonic() + 300  # Timeout after 5 minutes
+        returncodes = [
+            process.wait(timeout=max(0, deadline - time.monotonic()))
+            for process in processes
+        ]
+
+        succeeded = True
+        for command, returncode, error_file in zip(commands, returncodes, error_files):
+            if returncode != 0:
+                stderr = _read_tail(error_file, MAX_ERROR_OUTPUT)
+                print_error(f"{command[0]} failed with exit code {returncode}")
+                if stderr:
+                    print_error(f"Error: {stderr}")
+                succeeded = False
+
+    except subprocess.TimeoutExpired:
+        print_error("Pipeline timed out after 5 minutes")
+        return False
+    except Exception as e:
+        print_error(f"Failed to run pipeline: {str(e)}")
+        return False
+    finally:
+        # Don't leave half of a failed pipeline running
+        for process in processes:
+            if process.poll() is None:
+                process.kill()
+                process.wait()
+        for error_file in error_files:
+            error_file.close()
+
+    if succeeded:
+        print_success("Pipeline completed successfully")
+    return succeeded
+
+def run_file_operation(operation, description=""):
+    """
+    Run a filesystem operation in-process and report it like run_command
+
+    Args:
+        operation: Function (taking no arguments) that does the work
+        description: What this operation does (for logging)
+
+    Returns:
+        True if operation succeeded, False otherwise
+    """
+    if description:
+        print_info(description)
+
+    flush_output()
+    try:
+        operation()
+        print_success("Operation completed successfully")
+        return True
+    except OSError as e:
+        # shutil.Error is a subclass of OSError
+        print_error(f"Operation failed: {str(e)}")
+        return False
+
 # -----------------------------------------------------------------------------
 # STEP 4: Function to check if application is currently running
 # -----------------------------------------------------------------------------
 
+def find_app_pids():
+    """
+    Find the process IDs of the application
+
+    Returns:
+        List of PIDs (empty if app is not running)
+    """
+    # Systems without /proc (e.g. macOS) fall back to pgrep
+    if not os.path.isdir("/proc"):
+        try:
+            output = subprocess.check_output(["pgrep", "-f", APP_NAME])
+        except subprocess.CalledProcessError:
+            return []  # pgrep exits with 1 when nothing matches
+        return [int(pid) for pid in output.split()]
+
+    # Match on the full command line, like pgrep -f (modify based on your app)
+    pids = []
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit() or int(entry) == os.getpid():
+            continue
+        try:
+            with open(f"/proc/{entry}/cmdline", "rb") as cmdline_file:
+                cmdline = cmdline_file.read().replace(b"\0", b" ").decode(errors="replace")
+        except OSError:
+            continue  # Process exited while we were looking
+        if APP_NAME in cmdline:
+            pids.append(int(entry))
+
+    return pids
+
 def check_app_running():
     """
     Check if application is currently running
@@ -125,14 +371,7 @@ def check_app_running():
     """
     print_info("Checking if application is running...")
 
-    # Check using process name (modify based on your app)
-    result = subprocess.run(
-        f"pgrep -f {APP_NAME}",
-        shell=True,
-        capture_output=True
-    )
-
-    if result.returncode == 0:
+    if find_app_pids():
         print_warning(f"{APP_NAME} is currently running")
         return True
     else:
@@ -143,6 +382,76 @@ def check_app_running():
 # STEP 5: Function to stop the application
 # -----------------------------------------------------------------------------
 
+def process_exists(pid):
+    """
+    Check if a process is still alive
+
+    Args:
+        pid: Process ID to check
+
+    Returns:
+        True if process exists, False otherwise
+    """
+    # Reap the process if we started it ourselves (e.g. during rollback)
+    try:
+        if os.waitpid(pid, os.WNOHANG)[0] == pid:
+            return False
+    except ChildProcessError:
+        pass
+
+    try:
+        os.kill(pid, 0)  # Signal 0 only checks the process exists
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True  # Exists, but owned by another user
+    return True
+
+def signal_processes(pids, sig):
+    """
+    Send a signal to a list of processes
+
+    Args:
+        pids: Process IDs to signal
+        sig: Signal to send (e.g. signal.SIGTERM)
+
+    Returns:
+        True if every process was signalled (or had already exited), False otherwise
+    """
+    for pid in pids:
+        try:
+            os.kill(pid, sig)
+        except ProcessLookupError:
+            pass  # Already exited
+        except PermissionError:
+            print_error(f"Not allowed to send {sig.name} to PID {pid}")
+            return False
+    return True
+
+def wait_for_exit(pids, timeout):
+    """
+    Wait for processes to exit, polling with exponential backoff
+
+    Args:
+        pids: Process IDs to wait for
+        timeout: Maximum seconds to wait
+
+    Returns:
+        List of PIDs still running after the timeout
+    """
+    deadline = time.monotonic() + timeout
+    delay = 0.1
+
+    while True:
+        pids = [pid for pid in pids if process_exists(pid)]
+        remaining_time = deadline - time.monotonic()
+        if not pids or remaining_time <= 0:
+            return pids
+
+        flush_output()
+        time.sleep(min(delay, remaining_time))
+        delay = min(delay * 2, 1.0)  # 100ms, 200ms, ... up to 1s
+
 def stop_application():
     """
     Stop the running application gracefully
@@ -152,26 +461,28 @@ def stop_application():
     """
     print_info(f"Stopping {APP_NAME}...")
 
+    pids = find_app_pids()
+    if not pids:
+        print_info(f"{APP_NAME} is not running")
+        return True
+
     # Try graceful shutdown first
-    if run_command(
-        f"pkill -SIGTERM -f {APP_NAME}",
-        "Sending SIGTERM (graceful shutdown) signal"
-    ):
+    print_info("Sending SIGTERM (graceful shutdown) signal")
+    if signal_processes(pids, signal.SIGTERM):
         # Wait for app to stop
-        time.sleep(5)
-
-        # Check if still running
-        if not check_app_running():
+        pids = wait_for_exit(pids, STOP_TIMEOUT)
+        if not pids:
             print_success("Application stopped successfully")
             return True
 
     # If still running, force kill
     print_warning("Graceful shutdown failed, forcing kill...")
-    if run_command(f"pkill -SIGKILL -f {APP_NAME}", "Sending SIGKILL signal"):
-        time.sleep(2)
+    print_info("Sending SIGKILL signal")
+    if signal_processes(pids, signal.SIGKILL) and not wait_for_exit(pids, 5):
         print_success("Application forcefully stopped")
         return True
 
+    print_error(f"Could not stop {APP_NAME} (PIDs: {pids})")
     return False
 
 # -----------------------------------------------------------------------------
@@ -180,7 +491,14 @@ def stop_application():
 
 def backup_current_version():
     """
-    Create backup of currently deployed version (for rollback)
+    Remember the currently deployed version (for rollback)
+
+    DEPLOY_DIR is a symlink to a directory under RELEASES_DIR, so the
+    current release itself is the backup and nothing needs copying.
+    Deployments from before the releases layout (DEPLOY_DIR is a real
+    directory) get a hardlink snapshot, which only copies metadata. If
+    BACKUP_DIR is on another filesystem, where hardlinks aren't possible,
+    the files are streamed across with tar in a single pass.
 
     Returns:
         Path to backup directory if successful, None otherwise
@@ -192,15 +510,41 @@ def backup_current_version():
         print_warning("No existing deployment to backup")
         return None
 
+    # Releases layout: the live release is kept as-is
+    if os.path.islink(DEPLOY_DIR):
+        backup_path = os.path.realpath(DEPLOY_DIR)
+        print_success(f"Backup is current release: {backup_path}")
+        return backup_path
+
     # Create backup directory with timestamp
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
     backup_path = f"{BACKUP_DIR}/{APP_NAME}_{timestamp}"
 
-    # Create backup
-    if run_command(
-        f"mkdir -p {BACKUP_DIR} && cp -r {DEPLOY_DIR} {backup_path}",
-        f"Backing up to {backup_path}"
+    if not run_file_operation(
+        lambda: os.makedirs(backup_path),
+        "Creating backup directory"
     ):
+        print_error("Backup failed!")
+        return None
+
+    if os.stat(DEPLOY_DIR).st_dev == os.stat(backup_path).st_dev:
+        # Same filesystem: create hardlink snapshot
+        backed_up = run_file_operation(
+            lambda: shutil.copytree(DEPLOY_DIR, backup_path, symlinks=True,
+                                    copy_function=os.link, dirs_exist_ok=True),
+            f"Backing up to {backup_path}"
+        )
+    else:
+        # Different filesystem: stream a copy through tar
+        backed_up = run_pipeline(
+            [
+                ["tar", "-C", DEPLOY_DIR, "-cf", "-", "."],
+                ["tar", "-C", backup_path, "-xf", "-"]
+            ],
+            f"Backing up to {backup_path}"
+        )
+
+    if backed_up:
         print_success(f"Backup created: {backup_path}")
         return backup_path
     else:
@@ -211,10 +555,80 @@ def backup_current_version():
 # STEP 7: Function to deploy new version
 # -----------------------------------------------------------------------------
 
-def deploy_new_version():
+def switch_release(release_dir):
+    """
+    Atomically point DEPLOY_DIR at a release directory
+
+    The new symlink is created next to DEPLOY_DIR and renamed over it,
+    so DEPLOY_DIR always points at a complete release.
+
+    Args:
+        release_dir: Release directory to make live
+
+    Returns:
+        True if switched successfully, False otherwise
+    """
+    temp_link = f"{DEPLOY_DIR}.tmp"
+
+    def switch():
+        # Clear a link left behind by an interrupted switch
+        if os.path.lexists(temp_link):
+            os.remove(temp_link)
+        os.symlink(release_dir, temp_link)
+        try:
+            os.replace(temp_link, DEPLOY_DIR)
+        except OSError:
+            os.remove(temp_link)  # Don't leave a dangling link behind
+            raise
+
+    return run_file_operation(switch, f"Switching {DEPLOY_DIR} -> {release_dir}")
+
+def prune_releases(keep, protected=()):
+    """
+    Remove old releases and backup snapshots
+
+    Keeps the newest `keep` entries in each of RELEASES_DIR and BACKUP_DIR
+    (their names start with a timestamp, so they sort by age).
+
+    Args:
+        keep: How many releases (and backups) to keep
+        protected: Paths that are never removed (live release, rollback target)
+
+    Returns:
+        True if old releases were removed (or there were none), False otherwise
+    """
+    protected = {os.path.realpath(path) for path in protected if path}
+    protected.add(os.path.realpath(DEPLOY_DIR))
+
+    old_paths = []
+    for directory in (RELEASES_DIR, BACKUP_DIR):
+        if not os.path.isdir(directory):
+            continue
+        for name in sorted(os.listdir(directory), reverse=True)[keep:]:
+            path = os.path.join(directory, name)
+            if (os.path.isdir(path) and not os.path.islink(path)
+                    and os.path.realpath(path) not in protected):
+                old_paths.append(path)
+
+    if not old_paths:
+        return True
+
+    def remove_old_paths():
+        for path in old_paths:
+            shutil.rmtree(path)
+
+    return run_file_operation(remove_old_paths, f"Removing {len(old_paths)} old release(s)")
+
+def deploy_new_version(backup_path=None):
     """
     Deploy the new application version
 
+    Files unchanged since the previous release are hardlinked to it
+    instead of being copied again.
+
+    Args:
+        backup_path: Previous release directory to hardlink against (optional)
+
     Returns:
         True if deployed successfully, False otherwise
     """
@@ -225,27 +639,59 @@ def deploy_new_version():
         print_error(f"Source directory not found: {SOURCE_DIR}")
         return False
 
-    # Create deployment directory
-    if not run_command(
-        f"mkdir -p {DEPLOY_DIR}",
-        "Creating deployment directory"
-    ):
+    # Release names start with the timestamp so they sort oldest to newest;
+    # microseconds keep two quick deploys of the same version apart
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+    release_dir = f"{RELEASES_DIR}/{timestamp}_{APP_VERSION}"
+
+    # Never sync (with --delete) into an existing, possibly live, release
+    if os.path.exists(release_dir):
+        print_error(f"Release directory already exists: {release_dir}")
         return False
 
-    # Copy new files
-    if not run_command(
-        f"cp -r {SOURCE_DIR}/* {DEPLOY_DIR}/",
-        "Copying new application files"
+    # Create releases directory
+    if not run_file_operation(
+        lambda: os.makedirs(RELEASES_DIR, exist_ok=True),
+        "Creating releases directory"
     ):
         return False
 
+    # Sync new files (including dotfiles), hardlinking unchanged files
+    # against a previous release that still exists
+    rsync_command = ["rsync", "-a", "--delete"]
+    if backup_path and os.path.isdir(backup_path):
+        rsync_command.append(f"--link-dest={backup_path}")
+    rsync_command += [f"{SOURCE_DIR}/", f"{release_dir}/"]
+
+    if not run_command(rsync_command, "Syncing new application files"):
+        # Don't leave a half-synced release behind
+        shutil.rmtree(release_dir, ignore_errors=True)
+        return False
+
     # Set proper permissions
-    if not run_command(
-        f"chmod +x {DEPLOY_DIR}/*.sh",
-        "Setting execute permissions"
-    ):
+    def make_scripts_executable():
+        for script in glob.glob(f"{release_dir}/*.sh"):
+            os.chmod(script, os.stat(script).st_mode | 0o111)
+
+    if not run_file_operation(make_scripts_executable, "Setting execute permissions"):
         return False
 
+    # Move a pre-releases deployment directory out of the way (once)
+    if os.path.exists(DEPLOY_DIR) and not os.path.islink(DEPLOY_DIR):
+        if not run_file_operation(
+            lambda: shutil.move(DEPLOY_DIR, f"{RELEASES_DIR}/{timestamp}_legacy"),
+            "Moving existing deployment directory into releases"
+        ):
+            return False
+
+    # Make the new release live
+    if not switch_release(release_dir):
+        return False
+
+    # Clean up old releases (a failure here doesn't fail the deployment)
+    if not prune_releases(KEEP_RELEASES, protected=[release_dir, backup_path]):
+        print_warning("Could not remove some old releases")
+
     print_success("New version deployed successfully")
     return True
 
@@ -269,14 +715,32 @@ def start_application():
     if not os.path.exists(start_script):
         print_warning(f"Start script not found: {start_script}")
         print_info("Attempting alternative start method...")
-        # Alternative: directly run the application
+        # Alternative: directly run the application in the background
         # Modify this based on your app (Java jar, Python app, etc.)
-        start_command = f"cd {DEPLOY_DIR} && nohup ./app &"
+        try:
+            with open_log_file(START_LOG_FILE) as log:
+                subprocess.Popen(
+                    ["nohup", "./app"],
+                    cwd=DEPLOY_DIR,
+                    stdout=log,
+                    stderr=log,
+                    start_new_session=True  # Keep running after this script exits
+                )
+            started = True
+        except Exception as e:
+            print_error(f"Failed to run command: {str(e)}")
+            started = False
     else:
-        start_command = f"{start_script}"
+        # The app inherits the log file, so its output outlives this script
+        started = run_command(
+            [start_script],
+            f"Executing start command (output in {START_LOG_FILE})",
+            log_file=START_LOG_FILE
+        )
 
-    # Start the application
-    if run_command(start_command, "Executing start command"):
+    # Check the application came up
+    if started:
+        flush_output()
         time.sleep(3)  # Give app time to start
         print_success("Application started")
         return True
@@ -288,6 +752,91 @@ def start_application():
 # STEP 9: Function to perform health check
 # -----------------------------------------------------------------------------
 
+def compute_poll_schedule(budget, upper_bound, expected_startup):
+    """
+    Work out when to poll the health endpoint
+
+    Most apps become healthy soon after starting, so polls are packed
+    densely at the start and spread out towards the timeout. Each poll
+    time follows the recurrence L(i+1) = L(i) + (F(L(i)) - F(L(i-1))) / p(L(i))
+    for an exponential startup-time prior p(t) = rate * e^(-rate * t).
+    The first poll is chosen (by bisection) so the last one lands on the
+    timeout.
+
+    Args:
+        budget: Maximum number of polls
+        upper_bound: Time (seconds) of the last poll
+        expected_startup: Mean startup time (seconds) of the prior
+
+    Returns:
+        List of poll times in seconds, measured from the start of the check
+
+    Raises:
+        ValueError: If budget is below 1, or upper_bound or expected_startup is not positive
+    """
+    if budget < 1:
+        raise ValueError(f"Health check poll budget must be at least 1, got {budget}")
+    if upper_bound <= 0:
+        raise ValueError(f"Health check timeout must be positive, got {upper_bound}")
+    if expected_startup <= 0:
+        raise ValueError(f"Expected startup time must be positive, got {expected_startup}")
+
+    rate = 1.0 / expected_startup
+
+    def build(first_poll):
+        times = [first_poll]
+        previous = 0.0
+        while len(times) < budget and times[-1] < upper_bound:
+            # For an exponential prior the recurrence simplifies to this gap
+            gap = math.expm1(min(rate * (times[-1] - previous), 700)) / rate
+            previous = times[-1]
+            times.append(times[-1] + gap)
+        return times
+
+    low, high = 0.0, upper_bound / budget
+    for _ in range(60):
+        middle = (low + high) / 2
+        times = build(middle)
+        if len(times) == budget and times[-1] <= upper_bound:
+            low = middle
+        else:
+            high = middle
+
+    times = build(low)
+    times[-1] = upper_bound
+    return times
+
+def open_http_connection(url, timeout):
+    """
+    Open a reusable (keep-alive) HTTP or HTTPS connection
+
+    Args:
+        url: Parsed URL (from urlparse) to connect to
+        timeout: Socket timeout in seconds
+
+    Returns:
+        http.client connection object
+    """
+    if url.scheme == "https":
+        return http.client.HTTPSConnection(url.hostname, url.port, timeout=timeout)
+    return http.client.HTTPConnection(url.hostname, url.port, timeout=timeout)
+
+def _get_status(connection, path):
+    """
+    Send a GET request and return the response status
+
+    Args:
+        connection: http.client connection to use
+        path: Path (and query string) to request
+
+    Returns:
+        HTTP status code
+    """
+    connection.request("GET", path)
+    response = connection.getresponse()
+    response.read()  # Drain the body so the connection can be reused
+    return response.status
+
 def health_check():
     """
     Check if application is healthy after deployment
@@ -297,36 +846,55 @@ def health_check():
     """
     print_info("Performing health check...")
 
-    # Try health check multiple times
-    max_attempts = 12  # 12 attempts = 60 seconds (5 sec interval)
-    attempt = 1
+    # Poll densely at first, then back off towards HEALTH_CHECK_TIMEOUT
+    poll_times = compute_poll_schedule(
+        HEALTH_CHECK_POLL_BUDGET,
+        HEALTH_CHECK_TIMEOUT,
+        HEALTH_CHECK_EXPECTED_STARTUP
+    )
+    max_attempts = len(poll_times)
 
-    while attempt <= max_attempts:
-        print_info(f"Health check attempt {attempt}/{max_attempts}")
+    # Reuse one connection for every attempt instead of starting curl each time
+    url = urlparse(HEALTH_CHECK_URL)
+    path = (url.path or "/") + (f"?{url.query}" if url.query else "")
+    connection = open_http_connection(url, timeout=5)
+    connection_used = False  # Has the open connection already served a request?
+    start_time = time.monotonic()
 
-        try:
-            # Use curl to check health endpoint
-            result = subprocess.run(
-                f"curl -sf {HEALTH_CHECK_URL}",
-                shell=True,
-                capture_output=True,
-                timeout=5
-            )
+    for attempt, poll_time in enumerate(poll_times, start=1):
+        # Wait until the next scheduled poll
+        flush_output()
+        time.sleep(max(0.0, start_time + poll_time - time.monotonic()))
+
+        print_info(f"Health check attempt {attempt}/{max_attempts} (t+{poll_time:.1f}s)")
+        flush_output()  # The request itself can take a few seconds
 
-            if result.returncode == 0:
+        try:
+            try:
+                status = _get_status(connection, path)
+            except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+                if not connection_used:
+                    raise
+                # The server closed the idle keep-alive connection between
+                # polls; that says nothing about the app, so retry on a new one
+                connection.close()
+                status = _get_status(connection, path)
+            connection_used = True
+
+            # Same rule as curl -f: only 4xx/5xx responses are failures
+            if status < 400:
                 print_success("✓ Application is healthy!")
+                connection.close()
                 return True
             else:
-                print_warning(f"Health check failed (attempt {attempt})")
+                print_warning(f"Health check failed with HTTP {status} (attempt {attempt})")
 
         except Exception as e:
             print_warning(f"Health check error: {str(e)}")
+            connection.close()  # Reconnects automatically on the next request
+            connection_used = False
 
-        # Wait before next attempt
-        if attempt < max_attempts:
-            time.sleep(5)
-        attempt += 1
-
+    connection.close()
     print_error("Health check failed - application is not responding")
     return False
 
@@ -353,11 +921,16 @@ def rollback(backup_path):
     # Stop current (failed) version
     stop_application()
 
-    # Restore backup
-    if run_command(
-        f"rm -rf {DEPLOY_DIR} && cp -r {backup_path} {DEPLOY_DIR}",
-        "Restoring previous version"
-    ):
+    # Restore backup by pointing DEPLOY_DIR back at it. A pre-releases
+    # DEPLOY_DIR that is still a real directory was never replaced, so it
+    # already holds the previous version and only needs restarting.
+    if os.path.exists(DEPLOY_DIR) and not os.path.islink(DEPLOY_DIR):
+        restored = True
+        print_info(f"{DEPLOY_DIR} was not replaced, restarting it as-is")
+    else:
+        restored = switch_release(backup_path)
+
+    if restored:
         # Start old version
         if start_application():
             print_success("Rollback completed successfully")
@@ -370,6 +943,40 @@ def rollback(backup_path):
 # STEP 11: Function to send deployment notification
 # -----------------------------------------------------------------------------
 
+def post_to_slack(payload):
+    """
+    POST a JSON payload to the Slack webhook
+
+    Args:
+        payload: JSON-encoded request body (bytes)
+
+    Returns:
+        True if Slack accepted the message, False otherwise
+    """
+    url = urlparse(SLACK_WEBHOOK)
+    connection = open_http_connection(url, timeout=10)
+
+    try:
+        connection.request(
+            "POST",
+            url.path,
+            body=payload,
+            headers={"Content-Type": "application/json"}
+        )
+        response = connection.getresponse()
+        response.read()
+
+        if response.status >= 400:
+            print_warning(f"Slack notification failed with HTTP {response.status}")
+            return False
+        return True
+
+    except Exception as e:
+        print_warning(f"Slack notification error: {str(e)}")
+        return False
+    finally:
+        connection.close()
+
 def send_notification(status, message):
     """
     Send deployment notification to team
@@ -380,8 +987,7 @@ def send_notification(status, message):
     """
     print_info(f"Sending {status} notification...")
 
-    # In real production, send to Slack/Email
-    # For demo, just log it
+    # Always log it; also send to Slack once a real webhook is configured
 
     notification = f"""
     ========================================
@@ -397,28 +1003,221 @@ def send_notification(status, message):
 
     print(notification)
 
-    # Uncomment below for real Slack integration:
-    # if SLACK_WEBHOOK and "YOUR/WEBHOOK" not in SLACK_WEBHOOK:
-    #     payload = {"text": notification}
-    #     subprocess.run(f"curl -X POST -H 'Content-type: application/json' --data '{json.dumps(payload)}' {SLACK_WEBHOOK}", shell=True)
+    if SLACK_WEBHOOK and "YOUR/WEBHOOK" not in SLACK_WEBHOOK:
+        # Serialize once; no shell quoting needed since nothing goes through a shell
+        payload = json.dumps({"text": notification}).encode()
+        post_to_slack(payload)
 
 # -----------------------------------------------------------------------------
-# STEP 12: Main deployment function
+# STEP 12: Pre-flight checks (run concurrently)
+# -----------------------------------------------------------------------------
+
+async def _check_running():
+    """Check if the application is running (without blocking the event loop)"""
+    return await asyncio.to_thread(check_app_running)
+
+async def _check_source():
+    """Check the build artifacts exist (and there is something to deploy)"""
+    return await asyncio.to_thread(
+        lambda: os.path.isdir(SOURCE_DIR) and bool(os.listdir(SOURCE_DIR))
+    )
+
+def _is_writable(path):
+    """Check path (or its closest existing parent) is writable"""
+    while not os.path.exists(path):
+        parent = os.path.dirname(path)
+        if parent == path:
+            return False
+        path = parent
+    return os.access(path, os.W_OK)
+
+async def _check_backup_fs():
+    """Check the releases and backup directories can be written to"""
+    return await asyncio.to_thread(
+        lambda: _is_writable(RELEASES_DIR) and _is_writable(BACKUP_DIR)
+    )
+
+async def _resolve_health_host():
+    """Resolve the health check host now, so the first health check doesn't have to"""
+    url = urlparse(HEALTH_CHECK_URL)
+    port = url.port or (443 if url.scheme == "https" else 80)
+    loop = asyncio.get_running_loop()
+    try:
+        # A slow resolver shouldn't hold up the other checks for long
+        await asyncio.wait_for(
+            loop.getaddrinfo(url.hostname, port, type=socket.SOCK_STREAM),
+            timeout=5
+        )
+    except asyncio.TimeoutError:
+        raise OSError(f"DNS lookup for {url.hostname} timed out after 5 seconds")
+    return True
+
+async def _gather_preflight_checks():
+    """Run all pre-flight checks concurrently"""
+    return await asyncio.gather(
+        _check_running(),
+        _check_source(),
+        _check_backup_fs(),
+        _resolve_health_host(),
+        return_exceptions=True  # One failing check shouldn't cancel the others
+    )
+
+def run_preflight_checks():
+    """
+    Run independent pre-flight checks at the same time
+
+    Returns:
+        Dictionary with "is_running" and "ok" (all required checks passed) results
+    """
+    print_info("Running pre-flight checks...")
+    flush_output()
+
+    # Catch bad health check settings now, not after the new version is live
+    try:
+        compute_poll_schedule(
+            HEALTH_CHECK_POLL_BUDGET,
+            HEALTH_CHECK_TIMEOUT,
+            HEALTH_CHECK_EXPECTED_STARTUP
+        )
+        config_ok = True
+    except ValueError as e:
+        print_error(f"Invalid health check configuration: {e}")
+        config_ok = False
+
+    # rsync is needed to deploy; find out before the app is stopped
+    if shutil.which("rsync"):
+        tools_ok = True
+    else:
+        print_error("rsync is not installed (needed to copy the new release)")
+        tools_ok = False
+
+    is_running, source_ok, backup_fs_ok, health_host_ok = asyncio.run(
+        _gather_preflight_checks()
+    )
+
+    # check_app_running() reports its own result; only errors are left
+    if isinstance(is_running, Exception):
+        print_warning(f"Could not check if {APP_NAME} is running: {is_running}")
+        is_running = False
+
+    if source_ok is not True:
+        print_error(f"Source directory not found or empty: {SOURCE_DIR}")
+        source_ok = False
+
+    if backup_fs_ok is not True:
+        print_warning(f"Releases/backup directories are not writable: {RELEASES_DIR}, {BACKUP_DIR}")
+
+    if health_host_ok is not True:
+        print_warning(f"Could not resolve health check host: {health_host_ok}")
+
+    return {"is_running": is_running, "ok": source_ok and config_ok and tools_ok}
+
+# -----------------------------------------------------------------------------
+# STEP 13: Deployment pipeline - the steps and how they are run
+# -----------------------------------------------------------------------------
+
+@dataclass
+class DeploymentContext:
+    """State shared between deployment steps"""
+    is_running: bool = False  # Checked once during pre-flight
+    backup_path: Optional[str] = None
+    timings: dict = field(default_factory=dict)  # Step name -> seconds
+
+@dataclass
+class Step:
+    """One step of the deployment pipeline"""
+    name: str
+    fn: Callable  # Takes the DeploymentContext, returns True on success
+    rollback: bool = False  # Roll back to the backup if this step fails
+
+def _step_preflight(context):
+    """Run pre-flight checks and remember whether the app is running"""
+    preflight = run_preflight_checks()
+    context.is_running = preflight["is_running"]
+    return preflight["ok"]
+
+def _step_backup(context):
+    """Back up the current version (only needed if the app is running)"""
+    if context.is_running:
+        context.backup_path = backup_current_version()
+        if not context.backup_path:
+            print_warning("Backup failed, but continuing deployment...")
+    return True
+
+def _step_stop(context):
+    """Stop the application if it is running"""
+    return not context.is_running or stop_application()
+
+def _step_deploy(context):
+    """Deploy the new version, hardlinking against the backup"""
+    return deploy_new_version(context.backup_path)
+
+def _step_start(context):
+    """Start the application"""
+    return start_application()
+
+def _step_health_check(context):
+    """Check the new version is healthy"""
+    return health_check()
+
+STEPS = [
+    Step("Pre-flight checks", _step_preflight),
+    Step("Backup current version", _step_backup),
+    Step("Stop application", _step_stop),
+    # The app is already stopped here, so a failed deploy restarts the backup
+    Step("Deploy new version", _step_deploy, rollback=True),
+    Step("Start application", _step_start, rollback=True),
+    Step("Health check", _step_health_check, rollback=True),
+]
+
+def _run_step(step, context):
+    """Run one step and record how long it took"""
+    start_time = time.monotonic()
+    try:
+        return step.fn(context)
+    finally:
+        context.timings[step.name] = time.monotonic() - start_time
+
+def run_steps(steps, context):
+    """
+    Run deployment steps in order, stopping at the first failure
+
+    Args:
+        steps: List of Step objects
+        context: DeploymentContext shared by the steps
+
+    Returns:
+        The first Step that failed, or None if all succeeded
+    """
+    for step in steps:
+        succeeded = _run_step(step, context)
+        flush_output()
+        if not succeeded:
+            return step
+
+    return None
+
+# -----------------------------------------------------------------------------
+# STEP 14: Main deployment function
 # -----------------------------------------------------------------------------
 
 def main():
     """
     Main deployment workflow
 
-    Steps:
-    1. Check current status
+    Runs the steps listed in STEPS:
+    1. Pre-flight checks (app status, source, rsync, disk, DNS)
     2. Backup current version
     3. Stop application
     4. Deploy new version
     5. Start application
     6. Health check
-    7. Rollback if health check fails
+    7. Rollback if deploying, starting or health check fails
     """
+    # Buffer output and flush it in batches (see flush_output)
+    if hasattr(sys.stdout, "reconfigure"):
+        sys.stdout.reconfigure(line_buffering=False)
+
     print("=" * 50)
     print("    AUTOMATED DEPLOYMENT SCRIPT")
     print(f"    Application: {APP_NAME}")
@@ -428,67 +1227,48 @@ def main():
     print()
 
     deployment_start_time = time.time()
-    backup_path = None
+    context = DeploymentContext()
 
     try:
-        # Step 1: Check if app is running
-        is_running = check_app_running()
-
-        # Step 2: Backup current version
-        if is_running:
-            backup_path = backup_current_version()
-            if not backup_path:
-                print_warning("Backup failed, but continuing deployment...")
-
-        # Step 3: Stop application if running
-        if is_running:
-            if not stop_application():
-                print_error("Failed to stop application")
-                return 1
-
-        # Step 4: Deploy new version
-        if not deploy_new_version():
-            print_error("Deployment failed")
-            return 1
-
-        # Step 5: Start application
-        if not start_application():
-            print_error("Failed to start application")
-            # Attempt rollback
-            if backup_path:
-                rollback(backup_path)
-            return 1
+        failed_step = run_steps(STEPS, context)
 
-        # Step 6: Health check
-        if not health_check():
-            print_error("Health check failed")
+        if failed_step:
+            print_error(f"{failed_step.name} failed")
             # Attempt rollback
-            if backup_path:
-                rollback(backup_path)
-                send_notification("failure", "Deployment failed health check, rolled back")
+            if failed_step.rollback and context.backup_path:
+                if rollback(context.backup_path):
+                    send_notification("failure", f"{failed_step.name} failed, rolled back")
+                else:
+                    send_notification("failure", f"{failed_step.name} failed, rollback failed")
             return 1
 
         # Success!
         deployment_time = time.time() - deployment_start_time
+        step_times = ", ".join(
+            f"{name}: {seconds:.1f}s" for name, seconds in context.timings.items()
+        )
         print()
         print("=" * 50)
         print_success(f"DEPLOYMENT COMPLETED SUCCESSFULLY!")
         print_success(f"Time taken: {deployment_time:.2f} seconds")
         print("=" * 50)
 
-        send_notification("success", f"Deployment completed in {deployment_time:.2f}s")
+        send_notification(
+            "success",
+            f"Deployment completed in {deployment_time:.2f}s ({step_times})"
+        )
         return 0
 
     except KeyboardInterrupt:
         print()
         print_warning("Deployment interrupted by user")
-        if backup_path:
-            rollback(backup_path)
+        if context.backup_path:
+            rollback(context.backup_path)
         return 1
     except Exception as e:
         print_error(f"Unexpected error: {str(e)}")
-        if backup_path:
-            rollback(backup_path)
+        if context.backup_path:
+            rollback(context.backup_path)
         return 1
 
 # -----------------------------------------------------------------------------
@@ -528,6 +1308,8 @@ if __name__ == "__main__":
 # - Return codes for success/failure status
 # - Docstrings and inline documentation
 # - Class-based organization (Colors class)
+# - Dataclasses and a table-driven step pipeline (STEPS)
+# - Concurrency (asyncio pre-flight checks)
 #
 # CI/CD INTEGRATION:
 # - Part of continuous delivery pipeline